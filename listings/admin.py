@@ -1,9 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
-from .models import User, Listing
+from .admin_tools import ScalableAdminMixin, TextInputFilter
+from .models import User, Listing, Booking, BookingArchive, Review
 
-class CustomUserAdmin(BaseUserAdmin):
+class CustomUserAdmin(ScalableAdminMixin, BaseUserAdmin):
     fieldsets = (
         (None, {"fields": ("email", "password")}),
         (_("Personal info"), {"fields": ()}),
@@ -17,17 +18,83 @@ class CustomUserAdmin(BaseUserAdmin):
         }),
     )
     list_display = ("email", "role", "is_staff")
-    search_fields = ("email",)
+    search_fields = ("^email",)
     ordering = ("email",)
 
 admin.site.register(User, CustomUserAdmin)
 
+
+class LandlordEmailFilter(TextInputFilter):
+    title = _("landlord email")
+    parameter_name = "landlord_email"
+    lookup = "landlord__email__iexact"
+
+
+class LocationFilter(TextInputFilter):
+    title = _("location")
+    parameter_name = "location"
+    lookup = "location__istartswith"
+
+
+class TenantEmailFilter(TextInputFilter):
+    title = _("tenant email")
+    parameter_name = "tenant_email"
+    lookup = "tenant__email__iexact"
+
+
+class ListingIdFilter(TextInputFilter):
+    title = _("listing id")
+    parameter_name = "listing_id"
+    lookup = "listing_id"
+
+    def queryset(self, request, queryset):
+        if self.value() and not self.value().strip().isdigit():
+            return queryset.none()
+        return super().queryset(request, queryset)
+
+
 @admin.register(Listing)
-class ListingAdmin(admin.ModelAdmin):
+class ListingAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ("title", "location", "price", "is_active", "landlord")
-    list_filter = ("is_active", "location", "landlord")
-    search_fields = ("title", "description", "location")
+    list_filter = ("is_active", "housing_type", LandlordEmailFilter, LocationFilter)
+    list_select_related = ("landlord",)
+    search_fields = ("^title", "^location", "=landlord__email")
     readonly_fields = ("created_at", "updated_at")
     autocomplete_fields = ["landlord"]
+    ordering = ("-id",)
+
+
+@admin.register(Booking)
+class BookingAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "listing", "tenant", "start_date", "end_date", "status")
+    list_filter = ("status", ListingIdFilter, TenantEmailFilter)
+    list_select_related = ("listing", "tenant")
+    search_fields = ("=tenant__email",)
+    autocomplete_fields = ["listing", "tenant"]
+    ordering = ("-id",)
+
+
+@admin.register(BookingArchive)
+class BookingArchiveAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "listing", "tenant", "start_date", "end_date", "status", "archived_at")
+    list_filter = ("status", ListingIdFilter, TenantEmailFilter)
+    list_select_related = ("listing", "tenant")
+    search_fields = ("=tenant__email",)
+    ordering = ("-id",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
+@admin.register(Review)
+class ReviewAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "listing", "tenant", "rating", "created_at")
+    list_filter = ("rating", ListingIdFilter, TenantEmailFilter)
+    list_select_related = ("listing", "tenant")
+    search_fields = ("=tenant__email",)
+    autocomplete_fields = ["listing", "tenant"]
+    readonly_fields = ("created_at",)
+    ordering = ("-id",)
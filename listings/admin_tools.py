@@ -0,0 +1,166 @@
+"""
+Инструменты для changelist-страниц админки на больших таблицах:
+оценка количества строк вместо COUNT(*), выборка глубоких страниц через индекс первичного ключа,
+текстовые фильтры вместо списков всех значений и поиск по индексированным колонкам
+(индексы под istartswith/iexact — listings.indexes.CaseInsensitiveIndex).
+"""
+from django.contrib import admin
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+
+
+def estimated_table_rows(model, using):
+    """Оценка числа строк по статистике БД (PostgreSQL, MySQL); None, если оценки нет."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для changelist:
+    - без фильтров количество берётся из статистики БД (точный COUNT только для маленьких таблиц);
+    - с фильтрами COUNT ограничен FILTERED_COUNT_LIMIT строками;
+    - приблизительное количество не ограничивает навигацию: страницы за оценкой открываются,
+      пока в них есть строки (каждая страница читает на одну строку больше, чтобы знать, есть ли следующая);
+    - на глубоких страницах сначала выбираются только первичные ключи страницы (по индексу),
+      затем сами строки — OFFSET проходит по индексу, а не по полным строкам с JOIN.
+    """
+    EXACT_COUNT_THRESHOLD = 10000
+    FILTERED_COUNT_LIMIT = 10000
+    DEEP_PAGE_OFFSET = 1000
+
+    @cached_property
+    def _count(self):
+        """(количество, точное ли оно)."""
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_table_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.EXACT_COUNT_THRESHOLD:
+                return estimate, False
+            return queryset.count(), True
+        count = queryset.order_by()[:self.FILTERED_COUNT_LIMIT].count()
+        return count, count < self.FILTERED_COUNT_LIMIT
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_is_exact(self):
+        return self._count[1]
+
+    def validate_number(self, number):
+        if self.count_is_exact:
+            return super().validate_number(number)
+        # верхнюю границу проверяет page(): за приблизительным количеством могут быть строки
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        if self.count_is_exact and bottom < self.DEEP_PAGE_OFFSET:
+            return super().page(number)
+
+        top = bottom + self.per_page + (0 if self.count_is_exact else 1)
+        if bottom < self.DEEP_PAGE_OFFSET:
+            object_list = list(self.object_list[bottom:top])
+        else:
+            pks = list(self.object_list.values_list('pk', flat=True)[bottom:top])
+            rows = {obj.pk: obj for obj in self.object_list.filter(pk__in=pks)}
+            object_list = [rows[pk] for pk in pks if pk in rows]
+
+        if not self.count_is_exact:
+            if not object_list and number > 1:
+                raise EmptyPage(self.error_messages['no_results'])
+            has_next = len(object_list) > self.per_page
+            object_list = object_list[:self.per_page]
+            # оценка не ограничивает число страниц: следующая есть, пока текущая не последняя
+            self.num_pages = max(self.num_pages, number + 1) if has_next else number
+        return self._get_page(object_list, number, self)
+
+
+class TextInputFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех различных значений (для колонок с большой кардинальностью)."""
+    template = 'admin/listings/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value:
+            return queryset.filter(**{self.lookup: value.strip()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'query_parts': [(k, v) for k, v in changelist.params.items() if k != self.parameter_name],
+            'display': 'All',
+        }
+
+
+class ScalableAdminMixin:
+    """
+    Общие настройки changelist для больших таблиц; числовой поиск ищет по первичному ключу.
+    Каждое поле поиска — отдельный подзапрос, подзапросы объединяются через UNION: OR по колонкам
+    (тем более разных таблиц) не даёт СУБД использовать их индексы, а каждая ветка UNION идёт по своему.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        search_fields = self.get_search_fields(request)
+        if not term or not search_fields:
+            return super().get_search_results(request, queryset, search_term)
+
+        lookups = [_search_lookup(str(field)) for field in search_fields]
+        manager = queryset.model._default_manager
+        for bit in smart_split(term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            branches = [manager.filter(**{lookup: bit}).values('pk') for lookup in lookups]
+            queryset = queryset.filter(pk__in=branches[0].union(*branches[1:]))
+        return queryset, False
+
+
+SEARCH_PREFIXES = {'^': 'istartswith', '=': 'iexact', '@': 'search'}
+
+
+def _search_lookup(field_name):
+    """Lookup для поля из search_fields по тем же префиксам, что и у ModelAdmin."""
+    lookup = SEARCH_PREFIXES.get(field_name[:1])
+    if lookup:
+        return f"{field_name[1:]}__{lookup}"
+    return f"{field_name}__icontains"
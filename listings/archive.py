@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Q, Value
+
+from .models import Booking, BookingArchive
+
+HISTORY_FIELDS = ('id', 'listing', 'tenant', 'start_date', 'end_date', 'status')
+
+
+def archivable_bookings(retention_days=None, today=None):
+    """Брони, завершившиеся или отменённые раньше окна хранения."""
+    if retention_days is None:
+        retention_days = settings.BOOKING_ARCHIVE_RETENTION_DAYS
+    cutoff = (today or date.today()) - timedelta(days=retention_days)
+    return Booking.objects.filter(
+        Q(end_date__lt=cutoff) | Q(status='cancelled', start_date__lt=cutoff)
+    )
+
+
+def archive_bookings(retention_days=None, batch_size=None, today=None):
+    """
+    Переносит старые брони в BookingArchive пачками.
+    Каждая пачка — отдельная транзакция: копия в архив и удаление из Booking.
+    Возвращает количество перенесённых броней.
+    """
+    if batch_size is None:
+        batch_size = settings.BOOKING_ARCHIVE_BATCH_SIZE
+    candidates = archivable_bookings(retention_days, today).order_by('id')
+
+    archived = 0
+    last_id = 0
+    while True:
+        ids = list(candidates.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        with transaction.atomic():
+            rows = list(candidates.filter(id__in=ids).select_for_update())
+            BookingArchive.objects.bulk_create(
+                [
+                    BookingArchive(
+                        id=booking.id,
+                        tenant_id=booking.tenant_id,
+                        listing_id=booking.listing_id,
+                        start_date=booking.start_date,
+                        end_date=booking.end_date,
+                        status=booking.status,
+                    )
+                    for booking in rows
+                ],
+                ignore_conflicts=True,
+            )
+            Booking.objects.filter(id__in=[booking.id for booking in rows]).delete()
+        archived += len(rows)
+
+    return archived
+
+
+def booking_history(**filters):
+    """
+    Брони вместе с архивом одним запросом (UNION ALL).
+    Возвращает словари с полями HISTORY_FIELDS и флагом archived.
+    """
+    live = Booking.objects.filter(**filters).annotate(
+        archived=Value(False, output_field=BooleanField())
+    ).values(*HISTORY_FIELDS, 'archived')
+    archive = BookingArchive.objects.filter(**filters).annotate(
+        archived=Value(True, output_field=BooleanField())
+    ).values(*HISTORY_FIELDS, 'archived')
+    return live.union(archive, all=True).order_by('-start_date', '-id')
@@ -0,0 +1,58 @@
+import base64
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Listing, ListingTombstone
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(updated_at, id) из непрозрачного курсора. ValueError, если курсор испорчен."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _after(queryset, time_field, id_field, cursor):
+    if cursor is None:
+        return queryset
+    timestamp, pk = cursor
+    return queryset.filter(Q(**{f"{time_field}__gt": timestamp}) | Q(**{time_field: timestamp, f"{id_field}__gt": pk}))
+
+
+def listing_changes(cursor=None, limit=None):
+    """
+    Изменения объявлений после курсора в порядке (updated_at, id).
+    Возвращает (объявления и надгробия вперемешку, следующий курсор, есть ли ещё).
+    Элементы — Listing или ListingTombstone; каждый источник читается по индексу не больше limit строк.
+    """
+    limit = limit or settings.LISTING_FEED_PAGE_SIZE
+    horizon = timezone.now() - timedelta(seconds=settings.LISTING_FEED_SAFETY_LAG_SECONDS)
+
+    listings = _after(Listing.objects.filter(updated_at__lt=horizon), 'updated_at', 'id', cursor)
+    tombstones = _after(ListingTombstone.objects.filter(deleted_at__lt=horizon), 'deleted_at', 'listing_id', cursor)
+
+    changes = [(listing.updated_at, listing.id, listing) for listing in listings.order_by('updated_at', 'id')[:limit + 1]]
+    changes += [
+        (tombstone.deleted_at, tombstone.listing_id, tombstone)
+        for tombstone in tombstones.order_by('deleted_at', 'listing_id')[:limit + 1]
+    ]
+    changes.sort(key=lambda change: change[:2])
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        next_cursor = encode_cursor(*changes[-1][:2])
+    else:
+        next_cursor = encode_cursor(*cursor) if cursor else None
+    return [change[2] for change in changes], next_cursor, has_more
@@ -0,0 +1,28 @@
+from django.db.models import F, Index
+from django.db.models.functions import Collate, Upper
+
+
+class CaseInsensitiveIndex(Index):
+    """
+    Индекс по одному текстовому полю под istartswith/iexact (поиск и фильтры админки).
+    Django строит эти lookups по-разному в разных СУБД, поэтому и индекс зависит от СУБД:
+    - PostgreSQL: UPPER(col::text) LIKE UPPER(...) — индекс по UPPER(col) с text_pattern_ops
+      (обычный btree не обслуживает ни UPPER(), ни LIKE в не-C локали);
+    - SQLite: col LIKE ... ESCAPE — регистронезависимый LIKE идёт по индексу только с COLLATE NOCASE;
+    - остальные (MySQL): обычный индекс, колонки и так сравниваются без учёта регистра.
+    """
+
+    def _backend_index(self, vendor):
+        field = self.fields[0]
+        if vendor == 'postgresql':
+            from django.contrib.postgres.indexes import OpClass
+
+            expression = OpClass(Upper(field), name='text_pattern_ops')
+        elif vendor == 'sqlite':
+            expression = Collate(F(field), 'NOCASE')
+        else:
+            return Index(fields=self.fields, name=self.name, db_tablespace=self.db_tablespace)
+        return Index(expression, name=self.name, db_tablespace=self.db_tablespace)
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        return self._backend_index(schema_editor.connection.vendor).create_sql(model, schema_editor, using, **kwargs)
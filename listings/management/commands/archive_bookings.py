@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from listings.archive import archivable_bookings, archive_bookings
+
+
+class Command(BaseCommand):
+    help = "Переносит завершённые и отменённые брони старше окна хранения в архив (для cron/планировщика)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=int, default=settings.BOOKING_ARCHIVE_RETENTION_DAYS,
+            help="Сколько дней хранить брони после окончания/отмены в основной таблице.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.BOOKING_ARCHIVE_BATCH_SIZE,
+            help="Количество броней в одной транзакции.",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Только посчитать брони для архивации, ничего не переносить.",
+        )
+
+    def handle(self, *args, **options):
+        retention_days = options['retention_days']
+
+        if options['dry_run']:
+            count = archivable_bookings(retention_days).count()
+            self.stdout.write(f"Bookings to archive: {count}")
+            return
+
+        count = archive_bookings(retention_days, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Bookings archived: {count}"))
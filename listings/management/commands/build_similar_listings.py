@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from listings.recommendations import (
+    process_similar_listings_queue,
+    rebuild_similar_listings,
+    refresh_similar_listings,
+)
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает индекс похожих объявлений (полностью, по очереди изменений или для указанных id)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="id изменённых объявлений для инкрементального обновления.")
+        parser.add_argument('--pending', action='store_true', help="Обработать объявления из очереди изменений.")
+        parser.add_argument('--count', type=int, default=None, help="Сколько похожих объявлений хранить.")
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            count = process_similar_listings_queue(options['count'])
+            self.stdout.write(self.style.SUCCESS(f"Recommendations refreshed: {count}"))
+            return
+
+        if options['ids']:
+            count = refresh_similar_listings(options['ids'], options['count'])
+            self.stdout.write(self.style.SUCCESS(f"Recommendations refreshed: {count}"))
+            return
+
+        count = rebuild_similar_listings(options['count'])
+        self.stdout.write(self.style.SUCCESS(f"Listings indexed: {count}"))
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_savedsearch_savedsearchkey_savedsearchmatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('listing_id', models.BigIntegerField(unique=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted_at', 'listing_id'], name='listings_li_deleted_398b85_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['updated_at', 'id'], name='listings_li_updated_42b339_idx'),
+        ),
+    ]
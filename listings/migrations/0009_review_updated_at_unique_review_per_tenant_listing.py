@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:52
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_reviews(apps, schema_editor):
+    # до ограничения один съёмщик мог оставить несколько отзывов к объявлению — оставляем последний
+    Review = apps.get_model('listings', 'Review')
+    duplicates = (
+        Review.objects.values('tenant_id', 'listing_id')
+        .annotate(total=Count('id'), last_id=Max('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        Review.objects.filter(tenant_id=row['tenant_id'], listing_id=row['listing_id']).exclude(id=row['last_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_listingtombstone_listing_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(remove_duplicate_reviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('tenant', 'listing'), name='unique_review_per_tenant_listing'),
+        ),
+    ]
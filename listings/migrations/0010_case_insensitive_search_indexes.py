@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:52
+
+import listings.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_review_updated_at_unique_review_per_tenant_listing'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=listings.indexes.CaseInsensitiveIndex(fields=['title'], name='listings_li_title_6ba558_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=listings.indexes.CaseInsensitiveIndex(fields=['location'], name='listings_li_locatio_4bc07d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=listings.indexes.CaseInsensitiveIndex(fields=['email'], name='listings_us_email_c12c68_idx'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager, Permission
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from .indexes import CaseInsensitiveIndex
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, name, password=None, **extra_fields):
         if not email:
@@ -32,6 +34,12 @@ class User(AbstractUser, PermissionsMixin):
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # поиск по email в админке (=landlord__email, =tenant__email — iexact)
+            CaseInsensitiveIndex(fields=['email']),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -56,10 +64,39 @@ class Listing(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     image = models.ImageField(upload_to="listing_images/", null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+            # поиск и фильтры админки по префиксу без учёта регистра (^title, ^location, location__istartswith)
+            CaseInsensitiveIndex(fields=['title']),
+            CaseInsensitiveIndex(fields=['location']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # исходное значение is_active — чтобы отличать активацию от обычного сохранения
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
+
     def __str__(self):
         return f"{self.title} - {self.location} (${self.price})"
 
 
+# 2.1 Удалённые объявления (для ленты изменений)
+class ListingTombstone(models.Model):
+    listing_id = models.BigIntegerField(unique=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'listing_id']),
+        ]
+
+    def __str__(self):
+        return f"Listing {self.listing_id} deleted at {self.deleted_at}"
+
+
 # 3. Бронирование
 class Booking(models.Model):
     tenant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="bookings")
@@ -70,10 +107,36 @@ class Booking(models.Model):
                               choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled')],
                               default='pending')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['listing', 'status', 'start_date', 'end_date']),
+            models.Index(fields=['end_date']),
+        ]
+
     def __str__(self):
         return f"Booking {self.id}: {self.tenant} -> {self.listing} ({self.start_date} - {self.end_date})"
 
 
+# 3.1 Архив бронирований (завершённые и отменённые брони вне окна хранения)
+class BookingArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # id исходной брони
+    tenant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_bookings")
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="archived_bookings")
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=20, choices=Booking._meta.get_field('status').choices)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tenant', 'start_date']),
+            models.Index(fields=['listing', 'start_date']),
+        ]
+
+    def __str__(self):
+        return f"Archived booking {self.id}: {self.tenant} -> {self.listing} ({self.start_date} - {self.end_date})"
+
+
 # 4. Отзывы
 class Review(models.Model):
     tenant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reviews")
@@ -81,11 +144,80 @@ class Review(models.Model):
     rating = models.PositiveIntegerField(choices=[(i, i) for i in range(1, 6)])
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'listing'], name='unique_review_per_tenant_listing'),
+        ]
 
     def __str__(self):
         return f"Review {self.id}: {self.listing} by {self.tenant} - {self.rating}★"
 
 
+# 4.1 Похожие объявления (предрассчитанные соседи)
+class ListingRecommendation(models.Model):
+    listing = models.OneToOneField(Listing, on_delete=models.CASCADE, primary_key=True, related_name="recommendation")
+    similar_ids = models.JSONField(default=list)
+    scores = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Similar to {self.listing_id}: {self.similar_ids}"
+
+
+class SimilarListingsQueue(models.Model):
+    """Объявления, изменённые после последнего обновления индекса похожих (обрабатывает build_similar_listings --pending)."""
+    listing_id = models.BigIntegerField()
+    queued_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Listing {self.listing_id} queued at {self.queued_at}"
+
+
+# 4.2 Сохранённые поиски
+class SavedSearch(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="saved_searches")
+    name = models.CharField(max_length=100, blank=True)
+    housing_type = models.CharField(max_length=20, choices=Listing.HOUSING_TYPES, blank=True, null=True)
+    rooms = models.PositiveIntegerField(blank=True, null=True)
+    price_min = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    price_max = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    search = models.CharField(max_length=255, blank=True)
+    key_count = models.PositiveSmallIntegerField(default=0, editable=False)  # сколько совпадений по индексу нужно
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Saved search {self.id}: {self.user} ({self.name})"
+
+
+class SavedSearchKey(models.Model):
+    """Инвертированный индекс: ключ (type:apartment, rooms:2, price:3, gram:lof, ...) -> сохранённый поиск."""
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name="keys")
+    key = models.CharField(max_length=100, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} -> {self.saved_search_id}"
+
+
+class SavedSearchMatch(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="saved_search_matches")
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name="matches")
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="saved_search_matches")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['saved_search', 'listing'], name='unique_saved_search_match'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Match {self.id}: {self.listing_id} for {self.user}"
+
+
 # 5. История просмотров - deleted as was planned as an additional
 
 
@@ -1,5 +1,7 @@
 from rest_framework import permissions
-from listings.models import Booking, Review
+from rest_framework.exceptions import NotFound
+
+from listings.reviews import get_review_eligibility
 
 
 class IsLandlord(permissions.BasePermission):
@@ -20,27 +22,17 @@ class CanReviewListing(permissions.BasePermission):
     """
     Разрешает оставлять отзыв только пользователям с ролью 'tenant' один раз, если бронь подтверждена.
     """
-    def has_permission(self, request, view):
-        user = request.user
+    message = "Вы не можете оставить отзыв к этому объявлению."
 
+    def has_permission(self, request, view):
         try:
             listing_id = view.kwargs['listing_id']
         except (AttributeError, KeyError):
             return False
 
-        if not user.is_authenticated or user.role != 'tenant':
-            return False
-
-        already_reviewed = Review.objects.filter(tenant=user, listing_id=listing_id).exists()
-        if already_reviewed:
-            return False
-
-        has_approved_booking = Booking.objects.filter(
-            tenant=user,
-            listing_id=listing_id,
-            status='approved'
-        ).exists()
-
-        return has_approved_booking
-
-
+        eligibility = get_review_eligibility(request, listing_id)
+        if not eligibility.listing_exists:
+            raise NotFound("Объявление не найдено.")
+        if not eligibility.allowed:
+            self.message = eligibility.reason
+        return eligibility.allowed
@@ -0,0 +1,425 @@
+"""
+Индекс похожих объявлений.
+
+Полный пересчёт (build_similar_listings) подбирает словарь, idf, статистики цены/комнат и
+категории, кодирует все активные объявления и сохраняет векторы в SIMILAR_LISTINGS_INDEX_DIR.
+Инкрементальное обновление кодирует только изменённые объявления с этими же замороженными
+параметрами и сравнивает их с сохранёнными векторами (файл читается через mmap), поэтому
+стоит O(N·d) на скалярные произведения, а не пересборку матрицы.
+
+Пересчёт и обновление держат index_lock(): файлы индекса меняет только один процесс за раз.
+"""
+import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только внутри процесса
+    fcntl = None
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Listing, ListingRecommendation, SimilarListingsQueue
+
+TOKEN_RE = re.compile(r"\w{2,}", re.UNICODE)
+MAX_TEXT_FEATURES = 2000
+BATCH_SIZE = 512
+
+VECTORS_FILE = 'vectors.npy'
+STATE_FILE = 'index.npz'
+LOCK_FILE = 'index.lock'
+
+# Веса блоков признаков в итоговом векторе
+WEIGHTS = {
+    'price': 1.0,
+    'rooms': 1.0,
+    'housing_type': 1.0,
+    'location': 1.5,
+    'text': 2.0,
+}
+
+FEATURE_FIELDS = ('id', 'title', 'description', 'location', 'price', 'rooms', 'housing_type')
+
+_lock = threading.RLock()
+_lock_held = False
+
+
+def _tokens(row):
+    return TOKEN_RE.findall(f"{row['title']} {row['description']}".lower())
+
+
+def _location(row):
+    return row['location'].strip().lower()
+
+
+def _scale(values, mean, std):
+    return (values - mean) / std if std else np.zeros_like(values)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+@dataclass(frozen=True)
+class FeatureEncoder:
+    """
+    Параметры кодирования, зафиксированные при полном пересчёте:
+    словарь и idf для TF-IDF (сублинейный tf, сглаженный idf), среднее и std для цены и комнат,
+    известные типы жилья и локации. Новые слова и локации до следующего полного пересчёта не учитываются.
+    """
+    vocabulary: tuple
+    idf: np.ndarray
+    price_mean: float
+    price_std: float
+    rooms_mean: float
+    rooms_std: float
+    housing_types: tuple
+    locations: tuple
+
+    @classmethod
+    def fit(cls, rows):
+        df = {}
+        for row in rows:
+            for token in set(_tokens(row)):
+                df[token] = df.get(token, 0) + 1
+        vocabulary = sorted(df, key=lambda t: (-df[t], t))[:MAX_TEXT_FEATURES]
+        idf = np.log((1 + len(rows)) / (1 + np.array([df[t] for t in vocabulary], dtype=float))) + 1
+
+        price = np.log1p(np.array([float(row['price']) for row in rows]))
+        rooms = np.array([row['rooms'] for row in rows], dtype=float)
+        return cls(
+            vocabulary=tuple(vocabulary),
+            idf=idf,
+            price_mean=float(price.mean()) if len(rows) else 0.0,
+            price_std=float(price.std()) if len(rows) else 0.0,
+            rooms_mean=float(rooms.mean()) if len(rows) else 0.0,
+            rooms_std=float(rooms.std()) if len(rows) else 0.0,
+            housing_types=tuple(sorted({row['housing_type'] for row in rows})),
+            locations=tuple(sorted({_location(row) for row in rows})),
+        )
+
+    @property
+    def dim(self):
+        return 2 + len(self.housing_types) + len(self.locations) + len(self.vocabulary)
+
+    def encode(self, rows):
+        """Векторы объявлений (float32), строки нормированы — скалярное произведение равно косинусной близости."""
+        matrix = np.zeros((len(rows), self.dim), dtype=np.float32)
+        if not rows:
+            return matrix
+
+        price = np.log1p(np.array([float(row['price']) for row in rows]))
+        rooms = np.array([row['rooms'] for row in rows], dtype=float)
+        matrix[:, 0] = WEIGHTS['price'] * _scale(price, self.price_mean, self.price_std)
+        matrix[:, 1] = WEIGHTS['rooms'] * _scale(rooms, self.rooms_mean, self.rooms_std)
+
+        type_offset = 2
+        location_offset = type_offset + len(self.housing_types)
+        text_offset = location_offset + len(self.locations)
+        type_index = {value: i for i, value in enumerate(self.housing_types)}
+        location_index = {value: i for i, value in enumerate(self.locations)}
+        token_index = {token: i for i, token in enumerate(self.vocabulary)}
+
+        text = np.zeros((len(rows), len(self.vocabulary)))
+        for i, row in enumerate(rows):
+            col = type_index.get(row['housing_type'])
+            if col is not None:
+                matrix[i, type_offset + col] = WEIGHTS['housing_type']
+            col = location_index.get(_location(row))
+            if col is not None:
+                matrix[i, location_offset + col] = WEIGHTS['location']
+            for token in _tokens(row):
+                col = token_index.get(token)
+                if col is not None:
+                    text[i, col] += 1.0
+        np.log1p(text, out=text)
+        text *= self.idf
+        matrix[:, text_offset:] = WEIGHTS['text'] * _normalize(text)
+        return _normalize(matrix)
+
+    def to_arrays(self):
+        return {
+            'vocabulary': np.array(self.vocabulary, dtype=str),
+            'idf': self.idf,
+            'stats': np.array([self.price_mean, self.price_std, self.rooms_mean, self.rooms_std]),
+            'housing_types': np.array(self.housing_types, dtype=str),
+            'locations': np.array(self.locations, dtype=str),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        price_mean, price_std, rooms_mean, rooms_std = arrays['stats'].tolist()
+        return cls(
+            vocabulary=tuple(arrays['vocabulary'].tolist()),
+            idf=arrays['idf'],
+            price_mean=price_mean,
+            price_std=price_std,
+            rooms_mean=rooms_mean,
+            rooms_std=rooms_std,
+            housing_types=tuple(arrays['housing_types'].tolist()),
+            locations=tuple(arrays['locations'].tolist()),
+        )
+
+
+def _index_path(name):
+    return os.path.join(settings.SIMILAR_LISTINGS_INDEX_DIR, name)
+
+
+@contextmanager
+def index_lock():
+    """
+    Эксклюзивный доступ к файлам индекса: RLock — между потоками процесса, flock на LOCK_FILE —
+    между процессами (cron --pending, полный пересчёт, воркеры с SIMILAR_LISTINGS_SYNC_REFRESH).
+    Повторный вход в том же потоке файл заново не блокирует.
+    """
+    global _lock_held
+    with _lock:
+        if _lock_held:
+            yield
+            return
+        os.makedirs(settings.SIMILAR_LISTINGS_INDEX_DIR, exist_ok=True)
+        with open(_index_path(LOCK_FILE), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # снимается при закрытии файла
+            _lock_held = True
+            try:
+                yield
+            finally:
+                _lock_held = False
+
+
+def _create_vectors(rows, dim):
+    """Новый файл векторов на `rows` строк; возвращает (временный путь, memmap для записи)."""
+    tmp = f"{_index_path(VECTORS_FILE)}.{os.getpid()}.tmp"
+    return tmp, np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=(rows, dim))
+
+
+@dataclass
+class SimilarityIndex:
+    """
+    Сохранённый индекс: строка i файла векторов принадлежит объявлению ids[i] (0 — свободная строка),
+    neighbours[i] и scores[i] — его соседи по убыванию близости (пустой хвост: id 0, близость -inf).
+    Векторы обновляются на месте через mmap, остальное — небольшой файл STATE_FILE.
+    """
+    encoder: FeatureEncoder
+    ids: np.ndarray
+    neighbours: np.ndarray
+    scores: np.ndarray
+    vectors: np.ndarray
+
+    @classmethod
+    def load(cls, mode='r'):
+        """Индекс из SIMILAR_LISTINGS_INDEX_DIR или None, если полного пересчёта ещё не было."""
+        try:
+            with np.load(_index_path(STATE_FILE)) as arrays:
+                encoder = FeatureEncoder.from_arrays(arrays)
+                ids, neighbours, scores = arrays['ids'], arrays['neighbours'], arrays['scores']
+            vectors = np.load(_index_path(VECTORS_FILE), mmap_mode=mode)
+        except FileNotFoundError:
+            return None
+        return cls(encoder, ids, neighbours, scores, vectors)
+
+    @property
+    def valid(self):
+        return self.ids > 0
+
+    def save_state(self):
+        self.vectors.flush()
+        path = _index_path(STATE_FILE)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, ids=self.ids, neighbours=self.neighbours, scores=self.scores, **self.encoder.to_arrays())
+        os.replace(tmp, path)  # атомарно: параллельные читатели не увидят недописанный файл
+
+    def set_neighbours(self, rows, indices, scores):
+        width = indices.shape[1]
+        self.neighbours[rows] = 0
+        self.scores[rows] = -np.inf
+        self.neighbours[rows, :width] = self.ids[indices]
+        self.scores[rows, :width] = scores
+
+    def grow(self, capacity):
+        """Увеличивает файл векторов и массивы до `capacity` строк; новые строки свободны."""
+        extra = capacity - len(self.ids)
+        tmp, grown = _create_vectors(capacity, self.encoder.dim)
+        grown[:len(self.ids)] = self.vectors
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp, _index_path(VECTORS_FILE))
+        self.vectors = np.load(_index_path(VECTORS_FILE), mmap_mode='r+')
+        self.ids = np.concatenate([self.ids, np.zeros(extra, dtype=np.int64)])
+        self.neighbours = np.vstack([self.neighbours, np.zeros((extra, self.neighbours.shape[1]), dtype=np.int64)])
+        self.scores = np.vstack([self.scores, np.full((extra, self.scores.shape[1]), -np.inf)])
+
+
+def nearest_neighbours(X, valid, rows, k):
+    """Top-k соседей для строк `rows` матрицы X пачками: (индексы, близости). Строки с valid=False не участвуют."""
+    k = min(k, int(valid.sum()) - 1)
+    if k <= 0:
+        empty = np.zeros((len(rows), 0))
+        return empty.astype(np.int64), empty
+
+    indices = np.empty((len(rows), k), dtype=np.int64)
+    scores = np.empty((len(rows), k))
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        sims = X[batch] @ X.T
+        sims[:, ~valid] = -np.inf
+        sims[np.arange(len(batch)), batch] = -np.inf  # исключаем само объявление
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        indices[start:start + len(batch)] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + len(batch)] = np.take_along_axis(top_sims, order, axis=1)
+    return indices, scores
+
+
+def _save(index, rows):
+    recommendations = []
+    for row in rows:
+        found = index.neighbours[row] > 0
+        recommendations.append(ListingRecommendation(
+            listing_id=int(index.ids[row]),
+            similar_ids=index.neighbours[row][found].tolist(),
+            scores=np.round(index.scores[row][found], 6).tolist(),
+        ))
+    ListingRecommendation.objects.bulk_create(
+        recommendations,
+        update_conflicts=True,
+        unique_fields=['listing'] if connection.features.supports_update_conflicts_with_target else None,
+        update_fields=['similar_ids', 'scores', 'updated_at'],
+    )
+
+
+def rebuild_similar_listings(k=None):
+    """Полный пересчёт: новые параметры кодирования, векторы и списки соседей. Возвращает число объявлений в индексе."""
+    k = k or settings.SIMILAR_LISTINGS_COUNT
+    with index_lock():
+        queued = SimilarListingsQueue.objects.order_by('-id').values_list('id', flat=True).first()
+        rows = list(Listing.objects.filter(is_active=True).order_by('id').values(*FEATURE_FIELDS))
+        encoder = FeatureEncoder.fit(rows)
+        ids = np.array([row['id'] for row in rows], dtype=np.int64)
+
+        tmp, vectors = _create_vectors(len(rows), encoder.dim)
+        for start in range(0, len(rows), BATCH_SIZE):
+            vectors[start:start + BATCH_SIZE] = encoder.encode(rows[start:start + BATCH_SIZE])
+        vectors.flush()
+        del vectors
+        os.replace(tmp, _index_path(VECTORS_FILE))
+
+        index = SimilarityIndex(
+            encoder=encoder,
+            ids=ids,
+            neighbours=np.zeros((len(ids), k), dtype=np.int64),
+            scores=np.full((len(ids), k), -np.inf),
+            vectors=np.load(_index_path(VECTORS_FILE), mmap_mode='r'),
+        )
+        everything = np.arange(len(ids))
+        index.set_neighbours(everything, *nearest_neighbours(index.vectors, index.valid, everything, k))
+        index.save_state()
+
+        with transaction.atomic():
+            ListingRecommendation.objects.exclude(listing_id__in=ids.tolist()).delete()
+            _save(index, everything)
+            if queued is not None:
+                SimilarListingsQueue.objects.filter(id__lte=queued).delete()
+    return len(ids)
+
+
+def _update_vectors(index, changed_ids):
+    """
+    Перекодирует изменённые объявления: снятые и удалённые освобождают строку, новые занимают
+    свободную (при нехватке файл растёт на четверть). Возвращает строки активных изменённых объявлений.
+    """
+    rows = list(Listing.objects.filter(id__in=changed_ids, is_active=True).values(*FEATURE_FIELDS))
+    active = {row['id'] for row in rows}
+    slot = {listing_id: i for i, listing_id in enumerate(index.ids.tolist()) if listing_id}
+
+    released = [slot.pop(listing_id) for listing_id in changed_ids - active if listing_id in slot]
+    index.vectors[released] = 0
+    index.ids[released] = 0
+    index.set_neighbours(released, np.zeros((len(released), 0), dtype=np.int64), np.zeros((len(released), 0)))
+
+    new = [row['id'] for row in rows if row['id'] not in slot]
+    free = np.flatnonzero(~index.valid).tolist()
+    if len(new) > len(free):
+        size = len(index.ids)
+        index.grow(size + max(len(new) - len(free), size // 4))
+        free += list(range(size, len(index.ids)))
+    for listing_id, row in zip(new, free):
+        slot[listing_id] = row
+        index.ids[row] = listing_id
+
+    changed_rows = [slot[row['id']] for row in rows]
+    if rows:
+        index.vectors[changed_rows] = index.encoder.encode(rows)
+    return changed_rows
+
+
+def refresh_similar_listings(changed_ids, k=None):
+    """
+    Инкрементальное обновление после изменения/удаления объявлений `changed_ids`.
+    Перекодируются только изменённые объявления; списки соседей пересчитываются для них и для тех,
+    чей список содержит изменённое объявление или должен его теперь включить.
+    Без сохранённого индекса (или при другом k) выполняется полный пересчёт.
+    """
+    k = k or settings.SIMILAR_LISTINGS_COUNT
+    changed_ids = set(changed_ids)
+    with index_lock():
+        index = SimilarityIndex.load(mode='r+')
+        if index is None or index.neighbours.shape[1] != k:
+            return rebuild_similar_listings(k)
+
+        changed_rows = _update_vectors(index, changed_ids)
+        valid = index.valid
+
+        if changed_rows:
+            sims = index.vectors @ index.vectors[changed_rows].T
+            sims[changed_rows, np.arange(len(changed_rows))] = -np.inf
+            best = sims.max(axis=1)
+        else:
+            best = np.full(len(index.ids), -np.inf)
+        # последний сосед — порог входа в список; пустой хвост (-inf) пропускает любого
+        enters = best > index.scores[:, -1]
+        contains = np.isin(index.neighbours, list(changed_ids)).any(axis=1)
+
+        affected = np.union1d(changed_rows, np.flatnonzero(valid & (enters | contains))).astype(np.int64)
+        index.set_neighbours(affected, *nearest_neighbours(index.vectors, valid, affected, k))
+        index.save_state()
+
+        with transaction.atomic():
+            ListingRecommendation.objects.filter(listing_id__in=changed_ids - set(index.ids.tolist())).delete()
+            _save(index, affected)
+    return len(affected)
+
+
+def enqueue_similar_listings(listing_ids):
+    SimilarListingsQueue.objects.bulk_create([SimilarListingsQueue(listing_id=i) for i in listing_ids])
+
+
+def process_similar_listings_queue(k=None):
+    """Обновляет индекс для объявлений из очереди (build_similar_listings --pending). Возвращает число обновлённых списков."""
+    with index_lock():
+        queued = list(SimilarListingsQueue.objects.values_list('id', 'listing_id'))
+        if not queued:
+            return 0
+        count = refresh_similar_listings({listing_id for _, listing_id in queued}, k)
+        # изменения, поставленные в очередь во время обновления, останутся до следующего запуска
+        SimilarListingsQueue.objects.filter(id__lte=max(pk for pk, _ in queued)).delete()
+    return count
+
+
+def similar_listing_ids(listing_id):
+    """Готовый список id похожих объявлений (один запрос по первичному ключу)."""
+    return (
+        ListingRecommendation.objects.filter(listing_id=listing_id)
+        .values_list('similar_ids', flat=True)
+        .first()
+    ) or []
@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, Max, OuterRef
+
+from .models import Booking, BookingArchive, Listing, Review
+
+# 'approved' — подтверждённые брони, записанные до перехода на статус 'confirmed' (есть в существующих данных)
+REVIEWABLE_BOOKING_STATUSES = ('confirmed', 'approved')
+
+
+@dataclass(frozen=True)
+class ReviewEligibility:
+    listing_exists: bool
+    is_tenant: bool
+    already_reviewed: bool = False
+    has_completed_booking: bool = False
+
+    @property
+    def allowed(self):
+        return self.listing_exists and self.is_tenant and not self.already_reviewed and self.has_completed_booking
+
+    @property
+    def reason(self):
+        if not self.is_tenant:
+            return "Только съёмщики могут оставлять отзывы."
+        if self.already_reviewed:
+            return "Вы уже оставили отзыв к этому объявлению."
+        if not self.has_completed_booking:
+            return "Только после подтверждённой и завершённой брони можно оставить отзыв."
+        return ""
+
+
+def _completed_bookings(model, user):
+    return model.objects.filter(
+        tenant=user,
+        listing=OuterRef('pk'),
+        status__in=REVIEWABLE_BOOKING_STATUSES,
+        end_date__lt=date.today(),
+    )
+
+
+def check_review_eligibility(user, listing_id):
+    """Может ли пользователь оставить отзыв к объявлению — один запрос с EXISTS-подзапросами."""
+    is_tenant = user.is_authenticated and user.role == 'tenant'
+    if not is_tenant:
+        return ReviewEligibility(listing_exists=Listing.objects.filter(id=listing_id).exists(), is_tenant=False)
+
+    row = (
+        Listing.objects.filter(id=listing_id)
+        .annotate(
+            already_reviewed=Exists(Review.objects.filter(tenant=user, listing=OuterRef('pk'))),
+            has_booking=Exists(_completed_bookings(Booking, user)),
+            has_archived_booking=Exists(_completed_bookings(BookingArchive, user)),
+        )
+        .values('already_reviewed', 'has_booking', 'has_archived_booking')
+        .first()
+    )
+    if row is None:
+        return ReviewEligibility(listing_exists=False, is_tenant=True)
+    return ReviewEligibility(
+        listing_exists=True,
+        is_tenant=True,
+        already_reviewed=row['already_reviewed'],
+        has_completed_booking=row['has_booking'] or row['has_archived_booking'],
+    )
+
+
+def get_review_eligibility(request, listing_id):
+    """То же, но с мемоизацией на запросе: permission, сериализатор и view делят один результат."""
+    memo = getattr(request, '_review_eligibility', None)
+    if memo is None:
+        memo = request._review_eligibility = {}
+    key = (request.user.pk, int(listing_id))
+    if key not in memo:
+        memo[key] = check_review_eligibility(request.user, listing_id)
+    return memo[key]
+
+
+def reviews_cache_key(listing_id):
+    """
+    Ключ кеша с версией из БД (число отзывов и время последнего изменения): новый, изменённый или
+    удалённый отзыв меняет ключ, поэтому ни один воркер не отдаст устаревший список, какой бы ни был кеш.
+    """
+    version = Review.objects.filter(listing_id=listing_id).aggregate(count=Count('id'), updated=Max('updated_at'))
+    updated = version['updated'].timestamp() if version['updated'] else 0
+    return f"listing_reviews:{listing_id}:{version['count']}:{updated}"
+
+
+def cached_reviews(listing_id, build):
+    """Сериализованный список отзывов объявления из кеша; build() вызывается при промахе."""
+    key = reviews_cache_key(listing_id)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.REVIEW_LIST_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,110 @@
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import SavedSearch, SavedSearchKey, SavedSearchMatch
+
+GRAM_SIZE = 3
+SEARCH_FIELDS = ('title', 'description', 'location')
+
+
+def search_terms(text):
+    """Термины поиска так же, как их разбивает SearchFilter: по пробелам и запятым."""
+    return [term for term in re.split(r"[\s,]+", (text or '').lower()) if term]
+
+
+def _price_bucket(price):
+    return int(price // settings.SAVED_SEARCH_PRICE_BUCKET)
+
+
+def _grams(term):
+    return {term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)}
+
+
+def saved_search_keys(saved_search):
+    """
+    Ключи индекса для сохранённого поиска и сколько из них должно совпасть.
+    SearchFilter ищет термины подстрокой (icontains), поэтому термины индексируются триграммами:
+    объявление, содержащее термин, содержит и все его триграммы. Объявление попадает ровно в один
+    ключ типа, комнат и цены и в ключ каждой своей триграммы, поэтому нужное число совпадений —
+    3 измерения плюс число триграмм поиска. Термины короче триграммы проверяются только при сверке.
+    """
+    keys = [
+        f"type:{saved_search.housing_type}" if saved_search.housing_type else "type:*",
+        f"rooms:{saved_search.rooms}" if saved_search.rooms is not None else "rooms:*",
+    ]
+
+    low, high = saved_search.price_min, saved_search.price_max
+    if high is not None and _price_bucket(high) - _price_bucket(low or 0) < settings.SAVED_SEARCH_MAX_PRICE_BUCKETS:
+        keys += [f"price:{b}" for b in range(_price_bucket(low or 0), _price_bucket(high) + 1)]
+    else:
+        keys.append("price:*")  # открытый или слишком широкий диапазон — проверяется точно при сверке
+
+    grams = sorted(set().union(*(_grams(term) for term in search_terms(saved_search.search))))
+    keys += [f"gram:{gram}" for gram in grams] or ["gram:*"]
+    return keys, 3 + max(len(grams), 1)
+
+
+def listing_keys(listing):
+    """Ключи, под которые попадает объявление: триграммы берутся внутри частей без пробелов и запятых, как термины."""
+    grams = set()
+    for field in SEARCH_FIELDS:
+        for part in search_terms(getattr(listing, field)):
+            grams |= _grams(part)
+    return [
+        f"type:{listing.housing_type}", "type:*",
+        f"rooms:{listing.rooms}", "rooms:*",
+        f"price:{_price_bucket(listing.price)}", "price:*",
+        "gram:*", *(f"gram:{gram}" for gram in grams),
+    ]
+
+
+def matches(saved_search, listing):
+    """Точная проверка с той же семантикой, что и фильтры PublicListingListView."""
+    if saved_search.price_min is not None and listing.price < saved_search.price_min:
+        return False
+    if saved_search.price_max is not None and listing.price > saved_search.price_max:
+        return False
+    haystack = [(getattr(listing, field) or '').lower() for field in SEARCH_FIELDS]
+    return all(
+        any(term in value for value in haystack)
+        for term in search_terms(saved_search.search)
+    )
+
+
+def index_saved_search(saved_search):
+    """Перестраивает ключи индекса после создания или изменения сохранённого поиска."""
+    keys, key_count = saved_search_keys(saved_search)
+    with transaction.atomic():
+        saved_search.key_count = key_count
+        saved_search.save(update_fields=['key_count'])
+        saved_search.keys.all().delete()
+        SavedSearchKey.objects.bulk_create(
+            [SavedSearchKey(saved_search=saved_search, key=key) for key in keys]
+        )
+
+
+def match_listing(listing):
+    """
+    Сопоставляет новое или активированное объявление со всеми сохранёнными поисками
+    через индекс и складывает совпадения во входящие пользователей. Возвращает число совпадений.
+    """
+    if not listing.is_active:
+        return 0
+
+    candidate_ids = (
+        SavedSearchKey.objects.filter(key__in=listing_keys(listing))
+        .values('saved_search', 'saved_search__key_count')
+        .annotate(hits=Count('id'))
+        .filter(hits=F('saved_search__key_count'))
+        .values_list('saved_search', flat=True)
+    )
+    found = [
+        SavedSearchMatch(user_id=saved_search.user_id, saved_search=saved_search, listing=listing)
+        for saved_search in SavedSearch.objects.filter(id__in=list(candidate_ids))
+        if matches(saved_search, listing)
+    ]
+    SavedSearchMatch.objects.bulk_create(found, ignore_conflicts=True)
+    return len(found)
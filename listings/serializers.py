@@ -1,10 +1,11 @@
-from django.utils import timezone
-from rest_framework import serializers, request
+from rest_framework import serializers
 from django.contrib.auth import get_user_model,authenticate
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.utils.translation import gettext_lazy as _
 from datetime import date, timedelta
-from listings.models import Listing, Review, Booking
+from django.db.models import Prefetch
+from listings.models import Listing, Review, Booking, SavedSearch, SavedSearchMatch
+from listings.reviews import get_review_eligibility
 
 User = get_user_model()
 
@@ -65,45 +66,138 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             },
         }
 
+# ---------------- Sparse fieldsets / expansion ----------------
+class DynamicFieldsMixin:
+    """
+    Сериализатор с ?fields= и ?expand=.
+    fields — какие поля оставить; expand — какие связи развернуть вложенными сериализаторами.
+    expandable_fields: имя -> (класс сериализатора, kwargs, 'select' | 'prefetch' | Prefetch(...)).
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = [name for name in expand or () if name in self.expandable_fields]
+        for name in expand:
+            serializer_class, field_kwargs, _ = self.expandable_fields[name]
+            self.fields[name] = serializer_class(read_only=True, **field_kwargs)
+        if fields:
+            keep = set(fields) | set(expand)
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, expand=None):
+        """select_related/prefetch_related под развёрнутые связи и .only() под запрошенные поля."""
+        expand = [name for name in expand or () if name in cls.expandable_fields]
+        serializer = cls(fields=fields, expand=expand)
+        concrete = {f.name for f in queryset.model._meta.concrete_fields}
+        select, prefetch, only = set(), set(), {queryset.model._meta.pk.name}
+
+        for name, field in serializer.fields.items():
+            source = field.source.split('.')
+            if name in expand and cls.expandable_fields[name][2] == 'select':
+                select.add(source[0])
+                related = queryset.model._meta.get_field(source[0]).related_model
+                only.add(f"{source[0]}__{related._meta.pk.name}")
+                only.update(
+                    f"{source[0]}__{sub.source}" for sub in field.fields.values()
+                    if sub.source in {f.name for f in related._meta.concrete_fields}
+                )
+            elif name in expand:
+                spec = cls.expandable_fields[name][2]
+                prefetch.add(spec if isinstance(spec, Prefetch) else source[0])
+            elif len(source) > 1:
+                select.add(source[0])  # listing.title, tenant.email и т.п.
+            if source[0] in concrete:
+                only.add(source[0])
+
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if fields:
+            queryset = queryset.only(*only)
+        return queryset
+
 # ---------------- User ----------------
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'name', 'email', 'role']
 
-# ---------------- Listing ----------------
-class ListingSerializer(serializers.ModelSerializer):
+
+class LandlordSerializer(serializers.ModelSerializer):
+    """Публичные данные арендодателя для ?expand=landlord."""
+    name = serializers.CharField(source='first_name', read_only=True)
+
     class Meta:
-        model = Listing
-        fields = '__all__'
-        read_only_fields = ['id', 'landlord', 'created_at', 'updated_at']
+        model = User
+        fields = ['id', 'name']
 
 # ---------------- Review ----------------
 class ReviewSerializer(serializers.ModelSerializer):
+    tenant_name = serializers.CharField(source='tenant.first_name', read_only=True)
+
     class Meta:
         model = Review
-        fields = ['id', 'rating', 'comment', 'created_at']
+        fields = ['id', 'tenant_name', 'rating', 'comment', 'created_at']
         read_only_fields = ['id', 'created_at']
 
     def validate(self, data):
-        listing = data.get('listing')
-        tenant = self.context['request'].user
+        request = self.context['request']
+        listing_id = self.context['view'].kwargs['listing_id']
 
-        approved_booking_exists = Booking.objects.filter(
-            listing=listing,
-            tenant=tenant,
-            status='approved',
-            end_date__lt=timezone.now()
-        ).exists()
-
-        if not approved_booking_exists:
+        # результат уже посчитан CanReviewListing для этого запроса — повторного запроса нет
+        if not get_review_eligibility(request, listing_id).allowed:
             raise serializers.ValidationError(
                 "Вы не можете оставить отзыв: у вас нет подтверждённой аренды этого жилья."
             )
 
         return data
+
+# ---------------- Listing ----------------
+class ListingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'landlord': (LandlordSerializer, {}, 'select'),
+        'reviews': (ReviewSerializer, {'many': True}, Prefetch('reviews', queryset=Review.objects.select_related('tenant'))),
+    }
+
+    class Meta:
+        model = Listing
+        fields = '__all__'
+        read_only_fields = ['id', 'landlord', 'created_at', 'updated_at']
+
+# ---------------- Saved searches ----------------
+class SavedSearchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SavedSearch
+        fields = ['id', 'name', 'housing_type', 'rooms', 'price_min', 'price_max', 'search', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+    def validate(self, data):
+        price_min = data.get('price_min', getattr(self.instance, 'price_min', None))
+        price_max = data.get('price_max', getattr(self.instance, 'price_max', None))
+        if price_min is not None and price_max is not None and price_min > price_max:
+            raise serializers.ValidationError("Минимальная цена не может быть больше максимальной.")
+        return data
+
+
+class SavedSearchMatchSerializer(serializers.ModelSerializer):
+    saved_search_name = serializers.CharField(source='saved_search.name', read_only=True)
+    listing = ListingSerializer(read_only=True)
+
+    class Meta:
+        model = SavedSearchMatch
+        fields = ['id', 'saved_search', 'saved_search_name', 'listing', 'created_at']
+
 # ---------------- Booking ----------------
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'listing': (ListingSerializer, {}, 'select'),
+    }
+
     class Meta:
         model = Booking
         fields = '__all__'
@@ -139,17 +233,37 @@ class BookingSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class LandlordBookingSerializer(serializers.ModelSerializer):
+class BookingHistorySerializer(serializers.Serializer):
+    """Строка истории броней: живая бронь или запись из архива."""
+    id = serializers.IntegerField()
+    listing = serializers.IntegerField()
+    tenant = serializers.IntegerField()
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    status = serializers.CharField()
+    archived = serializers.BooleanField()
+
+
+class LandlordBookingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     listing_title = serializers.CharField(source='listing.title', read_only=True)
     location = serializers.CharField(source='listing.location', read_only=True)
     tenant_email = serializers.EmailField(source='tenant.email', read_only=True)
 
+    expandable_fields = {
+        'listing': (ListingSerializer, {}, 'select'),
+    }
+
     class Meta:
         model = Booking
         fields = [
             'id',
             'listing',
+            'listing_title',
+            'location',
+            'tenant',
+            'tenant_email',
             'start_date',
             'end_date',
             'status',
         ]
+        read_only_fields = ['tenant', 'status']
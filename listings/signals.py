@@ -1,8 +1,13 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from .models import Listing, ListingTombstone
+from .recommendations import enqueue_similar_listings, refresh_similar_listings
+from .saved_searches import match_listing
+
 User = get_user_model()
 
 @receiver(post_save, sender=User)
@@ -10,3 +15,26 @@ def assign_default_role(sender, instance, created, **kwargs):
     if created and not instance.role:
         instance.role = 'tenant'
         instance.save()
+
+
+@receiver([post_save, post_delete], sender=Listing)
+def refresh_recommendations(sender, instance, **kwargs):
+    listing_id = instance.id
+    if settings.SIMILAR_LISTINGS_SYNC_REFRESH:
+        transaction.on_commit(lambda: refresh_similar_listings([listing_id]))
+    else:
+        enqueue_similar_listings([listing_id])  # обработает build_similar_listings --pending
+
+
+@receiver(post_save, sender=Listing)
+def match_saved_searches(sender, instance, created, **kwargs):
+    # только создание или активация (is_active: False -> True), а не любое сохранение
+    activated = created or getattr(instance, '_loaded_is_active', None) is False
+    instance._loaded_is_active = instance.is_active
+    if instance.is_active and activated:
+        transaction.on_commit(lambda: match_listing(instance))
+
+
+@receiver(post_delete, sender=Listing)
+def create_listing_tombstone(sender, instance, **kwargs):
+    ListingTombstone.objects.update_or_create(listing_id=instance.id)
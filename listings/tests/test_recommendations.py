@@ -0,0 +1,106 @@
+import random
+
+import numpy as np
+import pytest
+
+from listings.models import Listing, ListingRecommendation
+from listings.recommendations import (
+    FEATURE_FIELDS,
+    SimilarityIndex,
+    nearest_neighbours,
+    rebuild_similar_listings,
+    refresh_similar_listings,
+)
+
+K = 3
+WORDS = ['уютная', 'светлая', 'квартира', 'студия', 'дом', 'центр', 'парк', 'метро', 'ремонт', 'балкон', 'вид', 'тихий']
+LOCATIONS = ['Москва', 'Казань', 'Сочи', 'Тверь']
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def index_dir(settings, tmp_path):
+    settings.SIMILAR_LISTINGS_INDEX_DIR = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def rng():
+    return random.Random(27)
+
+
+def create_listing(rng, **fields):
+    values = {
+        'title': ' '.join(rng.sample(WORDS, 3)),
+        'description': ' '.join(rng.sample(WORDS, 5)),
+        'location': rng.choice(LOCATIONS),
+        'price': rng.randrange(20000, 200000),
+        'rooms': rng.randint(1, 5),
+        'housing_type': rng.choice(['apartment', 'house', 'studio']),
+    }
+    values.update(fields)
+    return Listing.objects.create(**values)
+
+
+def assert_matches_full_encode():
+    """Индекс после инкрементальных обновлений совпадает с кодированием всех активных объявлений с нуля."""
+    index = SimilarityIndex.load()
+    active = list(Listing.objects.filter(is_active=True).order_by('id').values(*FEATURE_FIELDS))
+    ids = np.array([row['id'] for row in active])
+    assert sorted(index.ids[index.valid].tolist()) == ids.tolist()
+
+    slot = {listing_id: i for i, listing_id in enumerate(index.ids.tolist()) if listing_id}
+    expected = index.encoder.encode(active)
+    np.testing.assert_allclose(index.vectors[[slot[i] for i in ids.tolist()]], expected, atol=1e-6)
+
+    everything = np.arange(len(active))
+    indices, scores = nearest_neighbours(expected, np.ones(len(active), dtype=bool), everything, K)
+    recommendations = dict(ListingRecommendation.objects.values_list('listing_id', 'similar_ids'))
+    assert set(recommendations) == set(ids.tolist())
+    for i, listing_id in enumerate(ids.tolist()):
+        stored = index.neighbours[slot[listing_id]]
+        assert stored[stored > 0].tolist() == ids[indices[i]].tolist()
+        np.testing.assert_allclose(index.scores[slot[listing_id], :scores.shape[1]], scores[i], atol=1e-5)
+        assert recommendations[listing_id] == ids[indices[i]].tolist()
+
+
+def test_refresh_equals_full_encode_after_edits_deletes_and_growth(rng):
+    listings = [create_listing(rng) for _ in range(12)]
+    assert rebuild_similar_listings(K) == 12
+    capacity = len(SimilarityIndex.load().ids)
+
+    edited, deleted, deactivated = listings[0], listings[1], listings[2]
+    edited.title = 'просторный дом у парка'  # новое слово вне словаря игнорируется
+    edited.price = 150000
+    edited.save()
+    deleted_id = deleted.id
+    deleted.delete()
+    deactivated.is_active = False
+    deactivated.save()
+    new = [create_listing(rng) for _ in range(6)]  # больше свободных строк — файл векторов растёт
+
+    refresh_similar_listings({edited.id, deleted_id, deactivated.id, *(listing.id for listing in new)}, K)
+    assert len(SimilarityIndex.load().ids) > capacity
+    assert_matches_full_encode()
+
+    deactivated.is_active = True
+    deactivated.save()
+    listings[3].location = 'Сочи'
+    listings[3].rooms = 4
+    listings[3].save()
+    removed_id = new[0].id
+    new[0].delete()
+
+    refresh_similar_listings({deactivated.id, listings[3].id, removed_id}, K)
+    assert_matches_full_encode()
+
+
+def test_refresh_without_index_rebuilds(rng):
+    listing = create_listing(rng)
+    create_listing(rng)
+
+    refresh_similar_listings({listing.id}, K)
+
+    assert SimilarityIndex.load() is not None
+    assert_matches_full_encode()
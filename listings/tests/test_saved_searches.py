@@ -0,0 +1,92 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from listings.models import Listing, SavedSearch, SavedSearchMatch, User
+from listings.saved_searches import index_saved_search, listing_keys, match_listing, matches, saved_search_keys
+
+TEXTS = ['Уютная квартира у метро', 'Loft, центр города', 'Дом с садом', 'студия-лофт', 'квартира в центре']
+SEARCHES = ['', 'лоф', 'центр', 'квартира метро', 'ав', 'loft,центр', 'сад дом', 'лофт', 'нет такого']
+HOUSING_TYPES = ['apartment', 'house', 'studio']
+
+
+def random_listing(rng):
+    return Listing(
+        title=rng.choice(TEXTS),
+        description=rng.choice(TEXTS),
+        location=rng.choice(['Москва', 'Нижний Новгород', 'Сочи']),
+        price=Decimal(rng.randrange(1000, 20000)),
+        rooms=rng.randint(1, 3),
+        housing_type=rng.choice(HOUSING_TYPES),
+    )
+
+
+def random_saved_search(rng):
+    low = rng.choice([None, Decimal(rng.randrange(1000, 10000))])
+    width = rng.choice([1000, 5000, 50000])  # 50000 — шире SAVED_SEARCH_MAX_PRICE_BUCKETS, ключ price:*
+    return SavedSearch(
+        housing_type=rng.choice([None, *HOUSING_TYPES]),
+        rooms=rng.choice([None, 1, 2, 3]),
+        price_min=low,
+        price_max=rng.choice([None, (low or 0) + width]),
+        search=rng.choice(SEARCHES),
+    )
+
+
+def expected_match(saved_search, listing):
+    return (
+        saved_search.housing_type in (None, listing.housing_type)
+        and saved_search.rooms in (None, listing.rooms)
+        and matches(saved_search, listing)
+    )
+
+
+def test_key_count_equals_hits_for_every_match():
+    """Совпадений ключей ровно key_count у каждого подходящего объявления и не больше — у любого."""
+    rng = random.Random(28)
+    for _ in range(2000):
+        saved_search, listing = random_saved_search(rng), random_listing(rng)
+        keys, key_count = saved_search_keys(saved_search)
+        assert len(keys) == len(set(keys))
+        hits = len(set(keys) & set(listing_keys(listing)))
+        assert hits <= key_count
+        if expected_match(saved_search, listing):
+            assert hits == key_count, (saved_search.search, listing.title, listing.description)
+
+
+def test_substring_terms_are_indexed_within_parts():
+    keys, key_count = saved_search_keys(SavedSearch(search='лоф'))
+    assert keys == ['type:*', 'rooms:*', 'price:*', 'gram:лоф']
+    assert key_count == 4
+
+    keys, key_count = saved_search_keys(SavedSearch(search='ав'))  # короче триграммы — только при сверке
+    assert keys[-1] == 'gram:*'
+    assert key_count == 4
+
+    listing = Listing(title='студия-лофт', description='', location='Loft, центр', price=Decimal(5000), rooms=1,
+                      housing_type='studio')
+    grams = {key for key in listing_keys(listing) if key.startswith('gram:')}
+    assert {'gram:лоф', 'gram:lof', 'gram:цен'} <= grams
+    assert 'gram:t,ц' not in grams and 'gram:t ц' not in grams  # триграммы не пересекают границы терминов
+
+
+@pytest.mark.django_db
+def test_match_listing_finds_exactly_the_matching_searches():
+    rng = random.Random(2028)
+    user = User.objects.create_user('tenant@example.com', 'Tenant')
+    saved_searches = []
+    for _ in range(60):
+        saved_search = random_saved_search(rng)
+        saved_search.user = user
+        saved_search.save()
+        index_saved_search(saved_search)
+        saved_searches.append(saved_search)
+
+    for _ in range(20):
+        listing = random_listing(rng)
+        listing.save()
+        match_listing(listing)
+        found = set(SavedSearchMatch.objects.filter(listing=listing).values_list('saved_search_id', flat=True))
+        assert found == {s.id for s in saved_searches if expected_match(s, listing)}
+    assert SavedSearchMatch.objects.exists()
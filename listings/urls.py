@@ -5,6 +5,7 @@ from .views import *
 
 router = DefaultRouter()
 router.register(r'bookings', BookingViewSet, basename='booking')
+router.register(r'saved-searches', SavedSearchViewSet, basename='saved-search')
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -14,8 +15,10 @@ urlpatterns = [
     path('listings/', PublicListingListView.as_view(), name='public-listings'),
     path('listings/create/', ListingListCreateView.as_view(), name='listing-create'),
 
+    path('listings/changes/', ListingChangeFeedView.as_view(), name='listing-changes'),
     path('listings/mine/', LandlordListingListView.as_view(), name='landlord-listings'),
     path('listings/<int:pk>/', ListingManageView.as_view(), name='listing-manage'),
+    path('listings/<int:pk>/similar/', SimilarListingListView.as_view(), name='listing-similar'),
 
     path('listings/<int:listing_id>/reviews/', ListingReviewListCreateView.as_view(), name='list-create-review'),
 
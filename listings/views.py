@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import generics, status, permissions, viewsets
 from rest_framework.exceptions import PermissionDenied
@@ -10,22 +11,62 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
+from django.db import IntegrityError, transaction
+from django.db.models import Case, When
 
 import logging
 
-from .models import Listing, Review, Booking
+from .archive import booking_history
+from .feed import decode_cursor, listing_changes
+from .models import Listing, ListingTombstone, Review, Booking, SavedSearch, SavedSearchMatch
+from .recommendations import similar_listing_ids
+from .reviews import cached_reviews, get_review_eligibility
+from .saved_searches import index_saved_search
 from .serializers import (
     RegisterSerializer,
     CustomTokenObtainPairSerializer,
     ListingSerializer,
     ReviewSerializer,
-    BookingSerializer
+    BookingSerializer,
+    LandlordBookingSerializer,
+    BookingHistorySerializer,
+    SavedSearchSerializer,
+    SavedSearchMatchSerializer
 )
-from .permissions import IsLandlord, IsTenant
+from .permissions import IsLandlord, IsTenant, CanReviewListing
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# ---------------------- Common ----------------------
+
+class SparseFieldsetMixin:
+    """
+    ?fields=a,b и ?expand=x,y для GET-запросов: сериализатор отдаёт только эти поля,
+    а queryset получает .only() и select_related/prefetch_related под них.
+    """
+
+    def _query_list(self, name):
+        if self.request is None or self.request.method not in permissions.SAFE_METHODS:
+            return None
+        value = self.request.query_params.get(name)
+        return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'optimize_queryset'):
+            queryset = serializer_class.optimize_queryset(
+                queryset, self._query_list('fields'), self._query_list('expand')
+            )
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if hasattr(self.get_serializer_class(), 'optimize_queryset'):
+            kwargs.setdefault('fields', self._query_list('fields'))
+            kwargs.setdefault('expand', self._query_list('expand'))
+        return super().get_serializer(*args, **kwargs)
+
 # ---------------------- Auth ----------------------
 
 class RegisterView(generics.CreateAPIView):
@@ -72,7 +113,7 @@ class LogoutView(APIView):
 
 # ---------------------- Listings ----------------------
 
-class PublicListingListView(generics.ListAPIView):
+class PublicListingListView(SparseFieldsetMixin, generics.ListAPIView):
     """Список активных объявлений для всех пользователей."""
     queryset = Listing.objects.filter(is_active=True)
     serializer_class = ListingSerializer
@@ -88,7 +129,7 @@ class PublicListingListView(generics.ListAPIView):
     ordering_fields = ['price', 'created_at']
 
 
-class LandlordListingListView(generics.ListAPIView):
+class LandlordListingListView(SparseFieldsetMixin, generics.ListAPIView):
     """Объявления текущего арендодателя."""
     serializer_class = ListingSerializer
     permission_classes = [IsLandlord, IsAuthenticated]
@@ -99,7 +140,7 @@ class LandlordListingListView(generics.ListAPIView):
         return Listing.objects.filter(landlord=self.request.user)
 
 
-class ListingListCreateView(ListCreateAPIView):
+class ListingListCreateView(SparseFieldsetMixin, ListCreateAPIView):
     """Создание и просмотр всех объявлений (для landlord)."""
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
@@ -109,7 +150,7 @@ class ListingListCreateView(ListCreateAPIView):
         serializer.save(landlord=self.request.user)
 
 
-class ListingManageView(RetrieveUpdateDestroyAPIView):
+class ListingManageView(SparseFieldsetMixin, RetrieveUpdateDestroyAPIView):
     """Обновление, удаление, переключение активности объявлений."""
     serializer_class = ListingSerializer
     permission_classes = [IsLandlord]
@@ -133,14 +174,98 @@ class ListingManageView(RetrieveUpdateDestroyAPIView):
 
     def delete(self, request, *args, **kwargs) -> Response:
         listing = self.get_object()
-        listing_title = listing.title
-        listing.delete()
-        logger.warning(f"Listing deleted: {listing_title} (ID: {listing.id})")
+        listing_id, listing_title = listing.id, listing.title
+        listing.delete()  # надгробие для ленты изменений создаёт сигнал post_delete
+        logger.warning(f"Listing deleted: {listing_title} (ID: {listing_id})")
         return Response({
             "status": "deleted",
             "message": f"Listing '{listing_title}' has been successfully deleted"
         }, status=status.HTTP_200_OK)
 
+
+class ListingChangeFeedView(APIView):
+    """Лента изменений объявлений после курсора: созданные, изменённые, снятые и удалённые."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs) -> Response:
+        cursor = request.query_params.get('cursor')
+        try:
+            cursor = decode_cursor(cursor) if cursor else None
+            limit = int(request.query_params.get('limit', settings.LISTING_FEED_PAGE_SIZE))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.LISTING_FEED_MAX_PAGE_SIZE))
+
+        changes, next_cursor, has_more = listing_changes(cursor, limit)
+        results = []
+        for change in changes:
+            if isinstance(change, ListingTombstone):
+                results.append({'op': 'delete', 'id': change.listing_id, 'changed_at': change.deleted_at})
+            elif change.is_active:
+                results.append({'op': 'upsert', 'id': change.id, 'changed_at': change.updated_at,
+                                'listing': ListingSerializer(change, context={'request': request}).data})
+            else:
+                results.append({'op': 'deactivate', 'id': change.id, 'changed_at': change.updated_at})
+
+        return Response({'results': results, 'next_cursor': next_cursor, 'has_more': has_more})
+
+
+class SimilarListingListView(SparseFieldsetMixin, generics.ListAPIView):
+    """Похожие объявления из предрассчитанного индекса."""
+    serializer_class = ListingSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Listing.objects.none()
+        ids = similar_listing_ids(self.kwargs['pk'])
+        if not ids:
+            return Listing.objects.none()
+        order = Case(*[When(id=listing_id, then=position) for position, listing_id in enumerate(ids)])
+        return Listing.objects.filter(id__in=ids, is_active=True).order_by(order)
+
+# ---------------------- Saved searches ----------------------
+
+class SavedSearchViewSet(viewsets.ModelViewSet):
+    """Сохранённые поиски пользователя и входящие с новыми подходящими объявлениями."""
+    serializer_class = SavedSearchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return SavedSearch.objects.none()
+        return SavedSearch.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        index_saved_search(serializer.save(user=self.request.user))
+
+    def perform_update(self, serializer):
+        index_saved_search(serializer.save())
+
+    @action(detail=False, methods=['get'], url_path='inbox')
+    def inbox(self, request) -> Response:
+        # без ?after — последние совпадения (новые сверху); ?after=<next> — следующие по возрастанию id,
+        # пока has_more не станет false, чтобы при большом потоке ничего не пропустить
+        limit = settings.SAVED_SEARCH_INBOX_LIMIT
+        matches = SavedSearchMatch.objects.filter(user=request.user).select_related('saved_search', 'listing')
+        after = request.query_params.get('after')
+        if after is None:
+            page = list(matches.order_by('-id')[:limit])
+            next_id, has_more = (page[0].id if page else None), False
+        elif not after.isdigit():
+            return Response({'error': 'after должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            page = list(matches.filter(id__gt=after).order_by('id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+            next_id = page[-1].id if page else int(after)
+        return Response({
+            'results': SavedSearchMatchSerializer(page, many=True).data,
+            'next': next_id,
+            'has_more': has_more,
+        })
+
 # ---------------------- Reviews ----------------------
 
 class ListingReviewListCreateView(generics.ListCreateAPIView):
@@ -148,36 +273,53 @@ class ListingReviewListCreateView(generics.ListCreateAPIView):
     serializer_class = ReviewSerializer
 
     def get_permissions(self):
-        return [permissions.IsAuthenticated()] if self.request.method == 'POST' else [permissions.AllowAny()]
+        if self.request.method == 'POST':
+            return [permissions.IsAuthenticated(), CanReviewListing()]
+        return [permissions.AllowAny()]
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Review.objects.none()
-        return Review.objects.filter(listing_id=self.kwargs['listing_id'])
+        return Review.objects.filter(listing_id=self.kwargs['listing_id']).select_related('tenant')
+
+    def list(self, request, *args, **kwargs) -> Response:
+        listing_id = self.kwargs['listing_id']
+        data = cached_reviews(listing_id, lambda: self.get_serializer(self.get_queryset(), many=True).data)
+        return Response(data)
 
     def perform_create(self, serializer):
         user = self.request.user
         listing_id = self.kwargs.get('listing_id')
-        listing = get_object_or_404(Listing, id=listing_id)
 
-        if user.role != 'tenant':
-            raise PermissionDenied("Только съёмщики могут оставлять отзывы.")
+        # права уже проверены CanReviewListing; мемоизированный результат без нового запроса
+        eligibility = get_review_eligibility(self.request, listing_id)
+        if not eligibility.allowed:
+            raise PermissionDenied(eligibility.reason)
 
-        if Review.objects.filter(tenant=user, listing=listing).exists():
+        # повторный отзыв отсекает уникальное ограничение (tenant, listing), а не предварительная проверка
+        try:
+            with transaction.atomic():
+                serializer.save(tenant=user, listing_id=listing_id)
+        except IntegrityError:
             raise PermissionDenied("Вы уже оставили отзыв к этому объявлению.")
 
-        if not Booking.objects.filter(tenant=user, listing=listing, status='approved').exists():
-            raise PermissionDenied("Только после подтверждённой брони можно оставить отзыв.")
-
-        serializer.save(tenant=user, listing=listing)
-
 # ---------------------- Bookings ----------------------
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """Работа с бронями: создание, просмотр, подтверждение, отклонение, отмена."""
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
 
+    def get_serializer_class(self):
+        # при генерации схемы request нет — описываем общий сериализатор
+        if getattr(self, 'swagger_fake_view', False) or self.request is None:
+            return BookingSerializer
+        # арендодатель видит название/локацию объявления и email арендатора
+        user = self.request.user
+        if self.action in ('list', 'retrieve') and getattr(user, 'role', None) == 'landlord':
+            return LandlordBookingSerializer
+        return BookingSerializer
+
     def get_permissions(self):
         if self.action == 'create':
             return [IsTenant()]
@@ -196,6 +338,20 @@ class BookingViewSet(viewsets.ModelViewSet):
             return Booking.objects.filter(listing__landlord=user)
         return Booking.objects.none()
 
+    def list(self, request, *args, **kwargs) -> Response:
+        # ?history=true — вместе с архивными бронями
+        if request.query_params.get('history') not in ('1', 'true', 'True'):
+            return super().list(request, *args, **kwargs)
+
+        user = request.user
+        if user.role == 'tenant':
+            rows = booking_history(tenant=user)
+        elif user.role == 'landlord':
+            rows = booking_history(listing__landlord=user)
+        else:
+            rows = []
+        return Response(BookingHistorySerializer(rows, many=True).data)
+
     @action(detail=False, methods=['post'], url_path='change_status')
     def change_status(self, request) -> Response:
         booking_id = request.data.get('booking_id')
@@ -0,0 +1,134 @@
+"""
+Документация API (Swagger/ReDoc).
+
+drf_yasg импортируется только при первом обращении к документации, а схема
+генерируется один раз (командой generate_openapi_schema при сборке образа или лениво
+на первом запросе) и дальше отдаётся готовым файлом, в том числе сжатым gzip.
+При DEBUG кеша нет — схема всегда соответствует текущему коду.
+Страницы Swagger UI и ReDoc схему не строят — они загружают этот файл.
+"""
+import gzip
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+SCHEMA_FILE = 'openapi.json'
+
+_lock = threading.Lock()
+_schema = None
+
+
+def _info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Rental System API",
+        default_version='v1',
+        description="Документация для API аренды недвижимости",
+    )
+
+
+def generate_schema():
+    """Генерирует схему OpenAPI и сохраняет её в API_SCHEMA_DIR (json и json.gz). Возвращает байты json."""
+    from drf_yasg.app_settings import swagger_settings
+    from drf_yasg.codecs import OpenAPICodecJson
+
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(_info())
+    content = OpenAPICodecJson(validators=[]).encode(generator.get_schema(request=None, public=True))
+
+    os.makedirs(settings.API_SCHEMA_DIR, exist_ok=True)
+    path = os.path.join(settings.API_SCHEMA_DIR, SCHEMA_FILE)
+    for target, data in ((path, content), (path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))):
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, target)  # атомарно: воркеры не увидят недописанный файл
+    return content
+
+
+def _read_schema():
+    path = os.path.join(settings.API_SCHEMA_DIR, SCHEMA_FILE)
+    if not os.path.exists(path) or not os.path.exists(path + '.gz'):
+        generate_schema()
+    with open(path, 'rb') as f:
+        content = f.read()
+    with open(path + '.gz', 'rb') as f:
+        compressed = f.read()
+    return {
+        'content': content,
+        'gzip': compressed,
+        'etag': f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+        'last_modified': int(os.path.getmtime(path)),
+    }
+
+
+def load_schema():
+    """
+    Схема из памяти процесса; при первом обращении читается с диска или генерируется.
+    При DEBUG генерируется на каждый запрос: схема меняется вместе с кодом, файл с прошлого запуска устарел бы.
+    """
+    global _schema
+    if settings.DEBUG:
+        generate_schema()
+        return _read_schema()
+    if _schema is not None:
+        return _schema
+
+    with _lock:
+        if _schema is None:
+            _schema = _read_schema()
+    return _schema
+
+
+def openapi_schema(request):
+    """Готовая схема OpenAPI с ETag/Last-Modified и gzip, если клиент его принимает."""
+    schema = load_schema()
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    # у сжатого и несжатого представлений разные ETag
+    etag = schema['etag'][:-1] + '-gz"' if use_gzip else schema['etag']
+
+    response = get_conditional_response(request, etag=etag, last_modified=schema['last_modified'])
+    if response is None:
+        response = HttpResponse(schema['gzip' if use_gzip else 'content'], content_type='application/json')
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        response['Content-Length'] = len(response.content)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(schema['last_modified'])
+    response['Cache-Control'] = f"public, max-age={settings.API_SCHEMA_MAX_AGE}"
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def _render_ui(request, renderer_name):
+    """
+    HTML Swagger UI/ReDoc без генерации схемы: страница — только шаблон drf_yasg с настройками,
+    а саму схему браузер загружает по SPEC_URL (openapi_schema).
+    """
+    from drf_yasg import renderers
+
+    renderer = getattr(renderers, renderer_name)()
+    context = {'request': request}
+    renderer.set_context(context)
+    context['title'] = _info().title
+    return HttpResponse(render_to_string(renderer.template, context, request), content_type='text/html; charset=utf-8')
+
+
+def swagger_ui(request, *args, **kwargs):
+    # старые ссылки вида /swagger/?format=openapi получают готовую схему
+    if request.GET.get('format') in ('openapi', 'json'):
+        return openapi_schema(request)
+    return _render_ui(request, 'SwaggerUIRenderer')
+
+
+def redoc_ui(request, *args, **kwargs):
+    if request.GET.get('format') in ('openapi', 'json'):
+        return openapi_schema(request)
+    return _render_ui(request, 'ReDocRenderer')
@@ -0,0 +1,18 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rental_system import docs
+
+
+class Command(BaseCommand):
+    help = "Генерирует схему OpenAPI в API_SCHEMA_DIR (json и json.gz) — запускать при сборке."
+
+    def handle(self, *args, **options):
+        if not settings.API_DOCS_ENABLED:
+            raise CommandError("API_DOCS_ENABLED=False: документация отключена.")
+
+        content = docs.generate_schema()
+        path = os.path.join(settings.API_SCHEMA_DIR, docs.SCHEMA_FILE)
+        self.stdout.write(self.style.SUCCESS(f"OpenAPI schema written: {path} ({len(content)} bytes)"))
@@ -0,0 +1,168 @@
+"""
+Раздача медиафайлов (изображения объявлений) в production.
+
+Режимы (MEDIA_SERVE_MODE):
+- static            — как раньше: django.conf.urls.static.static, только при DEBUG;
+- stream            — файл отдаёт Django через FileResponse (sendfile через wsgi.file_wrapper), с поддержкой Range;
+- x-accel-redirect  — отдачу берёт на себя nginx (internal location MEDIA_ACCEL_REDIRECT_PREFIX);
+- x-sendfile        — отдачу берёт на себя Apache/lighttpd (mod_xsendfile).
+
+HashedMediaStorage один раз при загрузке добавляет к имени файла хеш содержимого (photo.<hash>.jpg),
+поэтому ответ на такой URL кешируется как immutable; файлы без хеша в имени (загруженные раньше)
+клиент каждый раз перепроверяет по ETag.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+HASH_LENGTH = 16
+HASHED_NAME_RE = re.compile(rf"\.([0-9a-f]{{{HASH_LENGTH}}})\.[^./]+$")
+
+
+def content_hash(content):
+    """Хеш содержимого загружаемого файла (первые HASH_LENGTH символов sha256)."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name, digest, max_length=None):
+    """dir/photo.jpg -> dir/photo.<digest>.jpg; при превышении max_length укорачивается основа имени, а не хеш."""
+    dir_name, file_name = os.path.split(name)
+    root, ext = os.path.splitext(file_name)
+    excess = len(os.path.join(dir_name, f"{root}.{digest}{ext}")) - max_length if max_length else 0
+    if excess > 0:
+        if excess >= len(root):
+            raise SuspiciousFileOperation(f'Storage can not find an available filename for "{name}".')
+        root = root[:-excess]
+    return os.path.join(dir_name, f"{root}.{digest}{ext}")
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """FileSystemStorage, сохраняющий файлы под именем с хешем содержимого; хеш считается один раз — при загрузке."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, content_hash(content), max_length)
+        if self.exists(name):
+            return name  # тот же хеш — то же содержимое, файл уже загружен
+        return super().save(name, content, max_length)
+
+
+class RangeFile:
+    """Окно [start, start + length) открытого файла для FileResponse; fileno() оставляет возможность sendfile."""
+
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self.file = f
+        self.name = f.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) для одиночного диапазона bytes=...; None — заголовка нет или он не поддерживается."""
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+        return None  # синтаксически неверный диапазон игнорируется
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1  # bytes=-N — последние N байт
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Файл не найден")
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404("Файл не найден")
+    if not os.path.isfile(full_path):
+        raise Http404("Файл не найден")
+
+    hashed = HASHED_NAME_RE.search(path)
+    etag = f'"{hashed[1]}"' if hashed else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, full_path, path, stat.st_size, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if hashed:
+        response['Cache-Control'] = f"public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response['Cache-Control'] = "public, no-cache"
+    return response
+
+
+def _file_response(request, full_path, path, size, etag):
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+
+    # Range, Content-Length и саму отдачу выполняет фронт-сервер
+    if mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(path)
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and etag not in parse_etags(if_range):
+        byte_range = None  # файл изменился с момента первого запроса — отдаём целиком
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+        length = end - start + 1
+        response = FileResponse(RangeFile(open(full_path, 'rb'), start, length), content_type=content_type, status=206)
+        response['Content-Length'] = length
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+
+    response['Accept-Ranges'] = 'bytes'
+    return response
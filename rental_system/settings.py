@@ -26,13 +26,16 @@ INSTALLED_APPS = [
     'listings',
     'rental_system',
 
-    'drf_yasg',
-    
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
 ]
 
+# API docs: на воркерах без документации (API_DOCS_ENABLED=False) drf_yasg не подключается
+API_DOCS_ENABLED = env.bool('API_DOCS_ENABLED', default=True)
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.append('drf_yasg')
+
 # Middleware
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -140,6 +143,17 @@ STATICFILES_DIRS = [BASE_DIR / 'rental_system/static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Раздача медиа: static (только DEBUG) | stream | x-accel-redirect | x-sendfile — см. rental_system/media.py
+MEDIA_SERVE_MODE = env('MEDIA_SERVE_MODE', default='static')
+MEDIA_ACCEL_REDIRECT_PREFIX = env('MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+MEDIA_IMMUTABLE_MAX_AGE = env.int('MEDIA_IMMUTABLE_MAX_AGE', default=60 * 60 * 24 * 365)
+
+STORAGES = {
+    # хеш содержимого в имени загруженного файла — serve_media отдаёт такие файлы как immutable
+    'default': {'BACKEND': 'rental_system.media.HashedMediaStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 # Auth
 AUTH_USER_MODEL = 'listings.User'
 AUTHENTICATION_BACKENDS = [
@@ -155,6 +169,36 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Booking archive
+BOOKING_ARCHIVE_RETENTION_DAYS = env.int('BOOKING_ARCHIVE_RETENTION_DAYS', default=180)
+BOOKING_ARCHIVE_BATCH_SIZE = env.int('BOOKING_ARCHIVE_BATCH_SIZE', default=1000)
+
+# Similar listings
+SIMILAR_LISTINGS_COUNT = env.int('SIMILAR_LISTINGS_COUNT', default=10)
+# Векторы и параметры кодирования последнего полного пересчёта
+SIMILAR_LISTINGS_INDEX_DIR = env('SIMILAR_LISTINGS_INDEX_DIR', default=str(BASE_DIR / 'similarity_index'))
+# True — обновлять индекс сразу после коммита (один процесс, разработка); иначе id копятся в очереди
+SIMILAR_LISTINGS_SYNC_REFRESH = env.bool('SIMILAR_LISTINGS_SYNC_REFRESH', default=False)
+
+# Saved searches
+SAVED_SEARCH_PRICE_BUCKET = env.int('SAVED_SEARCH_PRICE_BUCKET', default=500)
+SAVED_SEARCH_MAX_PRICE_BUCKETS = env.int('SAVED_SEARCH_MAX_PRICE_BUCKETS', default=20)
+SAVED_SEARCH_INBOX_LIMIT = env.int('SAVED_SEARCH_INBOX_LIMIT', default=100)
+
+# Listing change feed
+LISTING_FEED_PAGE_SIZE = env.int('LISTING_FEED_PAGE_SIZE', default=100)
+LISTING_FEED_MAX_PAGE_SIZE = env.int('LISTING_FEED_MAX_PAGE_SIZE', default=500)
+# Записи моложе этого порога не отдаются: транзакция, начатая раньше, может закоммититься позже
+LISTING_FEED_SAFETY_LAG_SECONDS = env.int('LISTING_FEED_SAFETY_LAG_SECONDS', default=2)
+
+# Cache: по умолчанию в памяти процесса; общий кеш для всех воркеров — CACHE_URL (redis://..., pymemcache://...)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Reviews
+REVIEW_LIST_CACHE_TIMEOUT = env.int('REVIEW_LIST_CACHE_TIMEOUT', default=300)
+
 # Default PK
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -166,5 +210,13 @@ SWAGGER_SETTINGS = {
             'in': 'header',
             'description': 'Введите JWT токен в формате: Bearer <ваш_access_token>'
         }
-    }
+    },
+    'SPEC_URL': 'openapi-schema',
 }
+REDOC_SETTINGS = {
+    'SPEC_URL': 'openapi-schema',
+}
+
+# Готовая схема OpenAPI (manage.py generate_openapi_schema или лениво при первом запросе)
+API_SCHEMA_DIR = env('API_SCHEMA_DIR', default=str(BASE_DIR / 'openapi'))
+API_SCHEMA_MAX_AGE = env.int('API_SCHEMA_MAX_AGE', default=3600)
@@ -1,31 +1,29 @@
+import re
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework import permissions
+from django.urls import path, re_path, include
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Rental System API",
-        default_version='v1',
-        description="Документация для API аренды недвижимости",
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-    authentication_classes=[],
-)
+from rental_system import docs, media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('listings.urls')),  # эндпоинты с префиксом /api/
-
-    # Swagger/ReDoc
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
 
-# DEBUG
-if settings.DEBUG:
+# Swagger/ReDoc — drf_yasg загружается только при первом запросе к документации
+if settings.API_DOCS_ENABLED:
+    urlpatterns += [
+        path('openapi.json', docs.openapi_schema, name='openapi-schema'),
+        path('swagger/', docs.swagger_ui, name='schema-swagger-ui'),
+        path('redoc/', docs.redoc_ui, name='schema-redoc'),
+    ]
+
+# Медиафайлы
+if settings.MEDIA_SERVE_MODE != 'static':
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.*)$', media.serve_media, name='media'),
+    ]
+elif settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)